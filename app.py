@@ -1,7 +1,8 @@
-import json
+import os
 from pathlib import Path
 import streamlit as st
 from grafo_json import Grafo
+from json_utils import json_dumps, json_loads
 
 BASE_DIR = Path(__file__).parent          # carpeta donde está app.py
 PLANES_DIR = BASE_DIR / "planes"          # carpeta "planes" dentro del proyecto
@@ -18,26 +19,43 @@ if st.button("Reiniciar sesión (borrar progreso temporal)"):
     st.rerun()
 
 @st.cache_data(show_spinner=False)
-def listar_planes(dir_path: Path):
-    planes = sorted(dir_path.glob("*.json"))
-    return [(p.stem, p) for p in planes]
-
-@st.cache_data(show_spinner=True)
-def cargar_grafo_desde_json(path: Path) -> Grafo:
-    g = Grafo(nombre_plan=path.stem)
-    g.from_json_file(path)
-    return g
+def listar_planes(dir_path: Path, mtime: float):
+    # mtime solo forma parte de la llave del caché: cambia cuando se agregan
+    # o quitan planes del folder
+    # os.scandir reutiliza el stat de cada DirEntry: sin llamadas extra por archivo
+    with os.scandir(dir_path) as it:
+        planes = [
+            (e.name[:-5], Path(e.path))
+            for e in it
+            if e.name.endswith(".json") and e.is_file(follow_symlinks=False)
+        ]
+    planes.sort()
+    return planes
 
 @st.cache_data(show_spinner=False)
-def leer_json(path: Path):
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+def leer_json(path: Path, mtime: float):
+    with open(path, "rb") as f:
+        return json_loads(f.read())
+
+def materias_por_semestre(g: Grafo):
+    por_sem: dict = {}
+    for m in g.materias.values():
+        por_sem.setdefault(m.semestre, []).append(m.clave)
+    return [(s, sorted(por_sem[s])) for s in sorted(por_sem)]
+
+def json_actualizado(g: Grafo) -> bytes:
+    # Solo se vuelve a serializar cuando el grafo cambió desde la última vez
+    version, data = st.session_state.get("export", (None, b""))
+    if version != g.version:
+        data = json_dumps(g.to_json_dict())
+        st.session_state.export = (g.version, data)
+    return data
 
 
 st.title("Planes de estudio")
 
 # 1) Dropdown + uploader (igual que antes)
-planes_disponibles = listar_planes(PLANES_DIR)
+planes_disponibles = listar_planes(PLANES_DIR, PLANES_DIR.stat().st_mtime)
 nombres = ["(elige un plan)"] + [n for n, _ in planes_disponibles]
 eleccion = st.selectbox("Selecciona un plan:", nombres, index=0)
 
@@ -49,13 +67,13 @@ json_data = None
 
 if archivo_subido is not None:
     try:
-        json_data = json.load(archivo_subido)
+        json_data = json_loads(archivo_subido.getvalue())
         fuente_actual = "upload"
     except Exception as e:
         st.error(f"Error leyendo JSON subido: {e}")
 elif eleccion != "(elige un plan)":
     nombre, ruta = next((n, p) for n, p in planes_disponibles if n == eleccion)
-    json_data = leer_json(ruta)
+    json_data = leer_json(ruta, ruta.stat().st_mtime)
     fuente_actual = f"dropdown:{nombre}"
 
 # 3) Inicializar/reciclar el grafo en session_state
@@ -70,6 +88,9 @@ if fuente_actual is not None and fuente_actual != st.session_state.fuente:
     g.from_json_dict(json_data)
     st.session_state.grafo = g
     st.session_state.fuente = fuente_actual
+    # La agrupación por semestre solo depende de la estructura del plan
+    st.session_state.por_sem = materias_por_semestre(g)
+    st.session_state.pop("export", None)
 
 g = st.session_state.grafo
 
@@ -78,19 +99,14 @@ if g is not None:
 
     st.subheader("Materias disponibles (con correquisitos en paquete)")
     grupos = g.grupos_coreq_disponibles()
-
-    def _sem_or_inf(m):
-        return m.semestre if isinstance(m.semestre, int) else 999
-
-    grupos = sorted(grupos, key=lambda grp: min(_sem_or_inf(m) for m in grp))
+    # Cada grupo ya viene ordenado por (semestre, clave): su primer elemento
+    # tiene el semestre mínimo
+    grupos.sort(key=lambda grp: grp[0].sem_key)
 
     if not grupos:
         st.write("No hay materias disponibles por ahora.")
     else:
-        for grp in grupos:
-            # 3) Ordenar materias dentro del grupo por semestre y luego por clave
-            materias = sorted(grp, key=lambda m: (_sem_or_inf(m), m.clave))
-
+        for materias in grupos:
             # 4) Etiquetas: “CLAVE — Nombre (Sx)” mostrando semestre
             etiquetas = [
                 f"{m.clave} — {m.nombre} (S{m.semestre})" if m.semestre is not None else f"{m.clave} — {m.nombre}"
@@ -121,19 +137,14 @@ if g is not None:
     st.divider()
 
     st.subheader("Materias por semestre")
-    por_sem = {}
-    for m in g.materias.values():
-        por_sem.setdefault(m.semestre, []).append(m)
-
-    for s in sorted(por_sem):
-        st.write(f"**Semestre {s}**: " + ", ".join(sorted(f"{m.clave}" for m in por_sem[s])))
+    for s, claves in st.session_state.por_sem:
+        st.write(f"**Semestre {s}**: " + ", ".join(claves))
 
     # Botón para descargar el JSON ACTUALIZADO (con estados)
     st.subheader("Descargar tu progreso")
-    data_json = json.dumps(g.to_json_dict(), ensure_ascii=False, indent=2)
     st.download_button(
         label="Descargar JSON actualizado",
-        data=data_json.encode("utf-8"),
+        data=json_actualizado(g),
         file_name=f"{g.nombre_plan}_actualizado.json",
         mime="application/json"
     )
@@ -1,9 +1,12 @@
 import re
-import json
 import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from typing import Dict, List
-from pdfminer.high_level import extract_text
+from typing import Dict, Iterator, List, Optional, Tuple
+# Requires pypdfium2 (pip install pypdfium2). pdfminer is not used: its layout
+# analysis splits the plan tables into columns and yields no usable records.
+import pypdfium2 as pdfium
+from json_utils import json_dumps
 
 # Detect semester headers including accents and later semesters
 SEM_HEADER_RE = re.compile(
@@ -14,8 +17,53 @@ SEM_HEADER_RE = re.compile(
     re.IGNORECASE
 )
 
-COURSE_CODE_RE = re.compile(r'\b[A-Z]{3}-\d{5}\b')
-CREDITS_LINE_RE = re.compile(r'(\d{1,2})\s*$')  # credits 1..12 typically at end
+# Department prefixes seen in the ITAM plans; a fixed alternation lets the
+# regex reject most positions on the first character. This is only the fast
+# path: parse_record falls back to ANY_CODE_RE (and warns) when a record has a
+# code with a prefix that is not listed here.
+COURSE_PREFIXES = (
+    'ACT', 'ADM', 'CMP', 'COM', 'CON', 'CSO', 'DER', 'ECO', 'EGN',
+    'EIN', 'EST', 'FIS', 'IDI', 'IIO', 'LEN', 'MAT', 'POL', 'SDI',
+)
+COURSE_CODE_RE = re.compile(r'\b(?:' + '|'.join(COURSE_PREFIXES) + r')-\d{5}\b')
+ANY_CODE_RE = re.compile(r'\b[A-Z]{3}-\d{5}\b')
+
+# Column headers and plan notes that never belong to a course record
+SKIP_RE = re.compile(
+    r'\b(?:'
+    r'Prerrequisitos?|Clave|Materia|Cr[eé]ditos|'
+    r'NOTAS AL PLAN|LICENCIATURA EN|PLAN CONJUNTO|PARA ALUMNOS|'
+    r'TITULACI[ÓO]N|SERVICIO SOCIAL'
+    r')\b',
+    re.IGNORECASE
+)
+
+# One anchored match per line for chunk_course_records. Skip words take
+# priority over semester headers; both may appear anywhere in the line.
+# Credits are not part of the pattern: on a normalized line they can only
+# end a record when the last character is a digit, which is checked directly.
+CLASSIFY_RE = re.compile(
+    rf'^(?=.*?(?P<skip>{SKIP_RE.pattern}))'
+    rf'|^(?=.*?(?P<sem>{SEM_HEADER_RE.pattern}))',
+    re.IGNORECASE
+)
+
+# Name cleanup patterns used by clean_name / parse_record
+TRAILING_MARKER_RE = re.compile(r'\s*\([A-Za-z0-9]+\)\s*$')  # "(A)" and similar
+LEADING_CONNECTOR_RE = re.compile(r'^(y|e|,)\s+', re.IGNORECASE)
+CONNECTOR_RE = re.compile(r'\b(y|e|,|y\s+)\b', re.IGNORECASE)
+
+# Bound methods at module scope: direct calls, and mypyc-friendly if the
+# module is compiled (mypyc extrae_materias.py)
+_classify = CLASSIFY_RE.match
+_codes_finditer = COURSE_CODE_RE.finditer
+_any_codes_finditer = ANY_CODE_RE.finditer
+
+# Unlisted prefixes already reported (warn once per process)
+_unknown_prefixes: set = set()
+
+# (clave, nombre, creditos, prereqs)
+Record = Tuple[str, str, int, List[str]]
 
 SEM_ORD_TO_NUM = {
     'PRIMER': 1,
@@ -32,17 +80,23 @@ SEM_ORD_TO_NUM = {
 }
 
 def normalize_spaces(s: str) -> str:
-    s = s.replace('\xa0', ' ').replace(' ', ' ')
-    s = re.sub(r'\s+', ' ', s).strip()
-    return s
+    # str.split() already treats NBSP and other Unicode spaces as whitespace
+    return ' '.join(s.split())
 
-def is_header(line: str) -> bool:
-    return bool(SEM_HEADER_RE.search(line))
+def _trailing_credits(s: str) -> Optional[Tuple[int, str]]:
+    """
+    Split a trailing 1-2 digit credits token (credits 1..12 typically at end):
+    'Economía III 6' -> (6, 'Economía III'). None if there is no such token.
+    """
+    head, _, tail = s.rstrip().rpartition(' ')
+    if tail.isdecimal() and 1 <= len(tail) <= 2:
+        return int(tail), head
+    return None
 
 def clean_name(name: str) -> str:
     name = normalize_spaces(name)
     # remove (A) or similar trailing markers
-    name = re.sub(r'\s*\([A-Za-z0-9]+\)\s*$', '', name)
+    name = TRAILING_MARKER_RE.sub('', name)
     # remove duplicated spaces and separators
     name = name.strip(' -–—:;.,')
     return name
@@ -52,47 +106,61 @@ def chunk_course_records(lines: List[str]) -> List[str]:
     Join wrapped lines until we hit a line that ends with credits (1-2 digits).
     Ignore obvious headers or table headings.
     """
-    records = []
+    records: List[str] = []
     buf = ""
+    normalize = normalize_spaces
+    classify = _classify
     for raw in lines:
-        line = normalize_spaces(raw)
+        line = normalize(raw)
         if not line:
             continue
-        # skip column headers and notes
-        if re.search(r'\b(Prerrequisitos?|Clave|Materia|Cr[eé]ditos)\b', line, re.IGNORECASE):
-            continue
-        if re.search(r'\b(NOTAS AL PLAN|LICENCIATURA EN|PLAN CONJUNTO|PARA ALUMNOS|TITULACI[ÓO]N|SERVICIO SOCIAL)\b', line, re.IGNORECASE):
-            continue
-        if is_header(line):
-            # flush incomplete buffer (discard if no credits)
-            buf = ""
+        m = classify(line)
+        if m:
+            # skip column headers and notes
+            if m.lastgroup == "sem":
+                # flush incomplete buffer (discard if no credits)
+                buf = ""
             continue
 
         # accumulate; if buffer empty start with current line, else append
-        buf = f"{buf} {line}".strip() if buf else line
+        buf = f"{buf} {line}" if buf else line
 
         # if line ends with digits (credits), we close the record
-        if CREDITS_LINE_RE.search(line):
+        if line[-1].isdecimal():
             records.append(buf)
             buf = ""
     # no need to keep trailing buf without credits
     return records
 
-def parse_record(rec: str):
+def _warn_unknown_prefixes(codes: Iterator[str]) -> None:
+    new = {c[:3] for c in codes} - set(COURSE_PREFIXES) - _unknown_prefixes
+    if new:
+        _unknown_prefixes.update(new)
+        print(f"[AVISO] Prefijos de clave no listados en COURSE_PREFIXES: {', '.join(sorted(new))}",
+              file=sys.stderr)
+
+def parse_record(rec: str) -> Optional[Record]:
     """
     Parse a full joined record like:
     'ADM-12108 y ECO-12102 ECO-11103 Economía III 6'
     -> prereqs=['ADM-12108','ECO-12102'], clave='ECO-11103', nombre='Economía III', creditos=6
     """
     rec = normalize_spaces(rec)
-    mcred = CREDITS_LINE_RE.search(rec)
-    if not mcred:
+    cred = _trailing_credits(rec)
+    if cred is None:
         return None
-    creditos = int(mcred.group(1))
-    left = normalize_spaces(rec[:mcred.start()])
+    creditos, left = cred
 
     # find all codes and their spans
-    code_spans = [(m.group(0), m.span()) for m in COURSE_CODE_RE.finditer(left)]
+    code_spans = [(m.group(0), m.span()) for m in _codes_finditer(left)]
+    # Every code has a '-': if some '-' is not part of a known code, rescan with
+    # the generic pattern so an unlisted code never ends up in the name or
+    # shifts which code is taken as the course's key
+    if left.count('-') != len(code_spans):
+        any_spans = [(m.group(0), m.span()) for m in _any_codes_finditer(left)]
+        if len(any_spans) != len(code_spans):
+            _warn_unknown_prefixes(code for code, _ in any_spans)
+            code_spans = any_spans
     if not code_spans:
         return None
 
@@ -106,14 +174,21 @@ def parse_record(rec: str):
     nombre = clean_name(left[cend:])
 
     # guardrails: if name accidentally starts with connectors
-    nombre = re.sub(r'^(y|e|,)\s+', '', nombre, flags=re.IGNORECASE).strip()
+    nombre = LEADING_CONNECTOR_RE.sub('', nombre).strip()
 
     # If name looks empty (some PDFs can split awkwardly), try to salvage by
     # using tokens after last code that are not codes
     if not nombre:
         # remove any trailing codes and connectors, leave words
-        tmp = re.sub(COURSE_CODE_RE, '', left)
-        tmp = re.sub(r'\b(y|e|,|y\s+)\b', ' ', tmp, flags=re.IGNORECASE)
+        # (slice around the code spans we already found instead of re-scanning)
+        pieces: List[str] = []
+        prev = 0
+        for _, (s, e) in code_spans:
+            pieces.append(left[prev:s])
+            prev = e
+        pieces.append(left[prev:])
+        tmp = ''.join(pieces)
+        tmp = CONNECTOR_RE.sub(' ', tmp)
         nombre = clean_name(tmp)
 
     if not nombre:
@@ -121,34 +196,32 @@ def parse_record(rec: str):
 
     return clave, nombre, creditos, prereqs
 
+def _iter_lines(pdf_path: str) -> Iterator[str]:
+    """
+    Yield the text lines of the PDF page by page (PDFium reading order),
+    without materializing the whole document text.
+    """
+    pdf = pdfium.PdfDocument(pdf_path)
+    try:
+        for page in pdf:
+            textpage = page.get_textpage()
+            try:
+                yield from textpage.get_text_range().splitlines()
+            finally:
+                textpage.close()
+                page.close()
+    finally:
+        pdf.close()
+
 def pdf_to_json(pdf_path: str) -> Dict[str, dict]:
-    text = extract_text(pdf_path) or ""
-    lines = text.splitlines()
-    # We'll walk lines to know in which semester we are
-    current_sem = None
     data: Dict[str, dict] = {}
 
-    # First pass: annotate each line with semester (carry forward)
-    sem_annotated = []
-    for raw in lines:
-        line = normalize_spaces(raw)
-        if not line:
-            sem_annotated.append((current_sem, line))
-            continue
-        msem = SEM_HEADER_RE.search(line)
-        if msem:
-            key = msem.group(1).upper().replace('É', 'E')
-            current_sem = SEM_ORD_TO_NUM.get(key, current_sem)
-            sem_annotated.append((current_sem, ""))  # marker row (ignored later)
-        else:
-            sem_annotated.append((current_sem, line))
-
     # Group by contiguous blocks with the same semester and parse records inside
     block_lines: List[str] = []
-    block_sem = None
+    block_sem: Optional[int] = None
 
-    def flush_block():
-        nonlocal block_lines, block_sem, data
+    def flush_block() -> None:
+        nonlocal block_lines
         if block_sem is None:
             block_lines = []
             return
@@ -167,19 +240,28 @@ def pdf_to_json(pdf_path: str) -> Dict[str, dict]:
                 }
         block_lines = []
 
-    for sem, line in sem_annotated:
-        if sem != block_sem:
-            # semester changed; flush previous
-            flush_block()
-            block_sem = sem
-        if line:
-            block_lines.append(line)
+    # Single pass over the streamed lines: track the semester we are in and
+    # flush the current block every time it changes. Lines are kept raw;
+    # chunk_course_records normalizes them (and drops blank ones) itself.
+    current_sem: Optional[int] = None
+    sem_search = SEM_HEADER_RE.search
+    for line in _iter_lines(pdf_path):
+        msem = sem_search(line)
+        if msem:
+            key = msem.group(1).upper().replace('É', 'E')
+            current_sem = SEM_ORD_TO_NUM.get(key, current_sem)
+            if current_sem != block_sem:
+                # semester changed; flush previous
+                flush_block()
+                block_sem = current_sem
+            continue
+        block_lines.append(line)
     # flush last
     flush_block()
 
     return data
 
-def ensure_dir(path: Path):
+def ensure_dir(path: Path) -> None:
     path.mkdir(parents=True, exist_ok=True)
 
 def process_single(pdf_file: Path, out_target: Path) -> Path:
@@ -192,28 +274,31 @@ def process_single(pdf_file: Path, out_target: Path) -> Path:
         ensure_dir(out_target)
         out_path = out_target / (pdf_file.stem + ".json")
 
-    with out_path.open("w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    with out_path.open("wb") as f:
+        f.write(json_dumps(data))
 
     print(f"[OK] {pdf_file.name} -> {out_path.name}   ({len(data)} materias)")
     return out_path
 
-def process_folder(in_dir: Path, out_dir: Path):
+def process_folder(in_dir: Path, out_dir: Path) -> None:
     ensure_dir(out_dir)
     pdfs = sorted([p for p in in_dir.glob("*.pdf") if p.is_file()])
     if not pdfs:
         print("No se encontraron PDFs en", in_dir)
         return
     total = 0
-    for pdf in pdfs:
-        try:
-            process_single(pdf, out_dir)
-            total += 1
-        except Exception as e:
-            print(f"[ERROR] {pdf.name}: {e}")
+    # each PDF is independent and writes its own output file
+    with ProcessPoolExecutor() as ex:
+        futs = {ex.submit(process_single, pdf, out_dir): pdf for pdf in pdfs}
+        for fut in as_completed(futs):
+            try:
+                fut.result()
+                total += 1
+            except Exception as e:
+                print(f"[ERROR] {futs[fut].name}: {e}")
     print(f"Listo. Convertidos {total} archivos PDF a JSON en {out_dir}")
 
-def main():
+def main() -> None:
     """
     USO:
       1) Procesar TODOS los PDFs de un folder a otro folder:
@@ -8,9 +8,12 @@ Convención de estado:
 0 = no iniciada, 1 = cursando, 2 = completada
 """
 from __future__ import annotations
+from functools import reduce
+from operator import or_
 from pathlib import Path
-import json
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Set, Tuple
+
+from json_utils import json_dumps, json_loads
 
 
 # -------------------------
@@ -18,17 +21,48 @@ from typing import Dict, List, Optional
 # -------------------------
 
 class Nodo:
-    def __init__(self, nombre: str, clave: str, creditos: int, estado: int = 0, semestre: int | None = None):
+    __slots__ = ("nombre", "clave", "creditos", "siguiente", "prerr", "ligadas", "_estado", "_semestre",
+                 "sem_key", "bit", "mascara_prerr", "_grafo")
+
+    def __init__(self, nombre: str, clave: str, creditos: int, estado: int = 0, semestre: int | None = None,
+                 grafo: Grafo | None = None):
+        self._grafo = grafo  # grafo dueño, para avisarle de cambios
         self.nombre = nombre
         self.clave = clave
         self.creditos = creditos
         # Relaciones
-        self.siguiente: List[Nodo] = []  # materias que dependen de este nodo
-        self.prerr: List[Nodo] = []      # prerrequisitos (objetos Nodo)
-        self.ligadas: List[Nodo] = []    # correquisitos (objetos Nodo)
+        self.siguiente: Set[Nodo] = set()  # materias que dependen de este nodo
+        self.prerr: Set[Nodo] = set()      # prerrequisitos (objetos Nodo)
+        self.ligadas: Set[Nodo] = set()    # correquisitos (objetos Nodo)
         # Estado: 0 no iniciada, 1 cursando, 2 completada
         self.estado: int = int(estado)
-        self.semestre = semestre
+        self.semestre = semestre  # también fija sem_key
+        # Bitmasks asignadas por Grafo al construir sus índices
+        self.bit: int = 0            # 1 << i, único por materia
+        self.mascara_prerr: int = 0  # OR de los bits de sus prerrequisitos
+
+    @property
+    def estado(self) -> int:
+        return self._estado
+
+    @estado.setter
+    def estado(self, estado: int) -> None:
+        self._estado = estado
+        if self._grafo is not None:
+            self._grafo.version += 1
+
+    @property
+    def semestre(self) -> int | None:
+        return self._semestre
+
+    @semestre.setter
+    def semestre(self, semestre: int | None) -> None:
+        self._semestre = semestre
+        # Llave para ordenar por semestre; sin semestre va al final
+        self.sem_key: int = semestre if type(semestre) is int else 999
+        if self._grafo is not None:
+            # los grupos de correquisitos del grafo están ordenados por sem_key
+            self._grafo._invalidar_indices()
 
     # Helpers de estado
     def set_estado(self, estado: int) -> None:
@@ -52,11 +86,20 @@ class Grafo:
     def __init__(self, nombre_plan: str = "plan"):
         self.nombre_plan = nombre_plan
         self.materias: Dict[str, Nodo] = {}  # clave -> Nodo
+        # Índices derivados (se reconstruyen cuando cambia la estructura):
+        # componentes de correquisitos ordenadas por (semestre, clave) y los
+        # bits de cada materia (ver Nodo.bit / Nodo.mascara_prerr)
+        self._comps_coreq: Optional[List[Tuple[Nodo, ...]]] = None
+        # Se incrementa con cada cambio de estructura o de estado de sus materias
+        # (incluido asignar Nodo.estado directamente); sirve como llave barata
+        # para cachear resultados derivados (p. ej. el JSON exportado)
+        self.version: int = 0
 
     # --------- Construcción del grafo ---------
     def agregar_materia(self, nombre: str, clave: str, creditos: int, estado: int = 0, semestre: int | None = None) -> None:
+        self._invalidar_indices()
         if clave not in self.materias:
-            self.materias[clave] = Nodo(nombre, clave, creditos, estado, semestre)
+            self.materias[clave] = Nodo(nombre, clave, creditos, estado, semestre, grafo=self)
         else:
             # Actualiza metadata si ya existía
             n = self.materias[clave]
@@ -68,64 +111,67 @@ class Grafo:
     def _link_prerreq(self, clave: str, clave_prerr: str) -> None:
         if clave not in self.materias or clave_prerr not in self.materias:
             return
+        self._invalidar_indices()
         materia = self.materias[clave]
         prerr = self.materias[clave_prerr]
-        if prerr not in materia.prerr:
-            materia.prerr.append(prerr)
-        if materia not in prerr.siguiente:
-            prerr.siguiente.append(materia)
+        materia.prerr.add(prerr)
+        prerr.siguiente.add(materia)
 
     def _link_coreq(self, clave: str, clave_coreq: str) -> None:
         if clave not in self.materias or clave_coreq not in self.materias:
             return
+        self._invalidar_indices()
         a = self.materias[clave]
         b = self.materias[clave_coreq]
-        if b not in a.ligadas:
-            a.ligadas.append(b)
-        if a not in b.ligadas:
-            b.ligadas.append(a)
+        a.ligadas.add(b)
+        b.ligadas.add(a)
 
     # --------- Carga y guardado JSON ---------
     def from_json_dict(self, materias: Dict[str, dict]) -> None:
         """
-        Carga el grafo en dos pasos desde un dict JSON:
-        1) Crear todos los nodos
-        2) Conectar prerrequisitos y correquisitos
+        Carga el grafo desde un dict JSON con una sola pasada sobre las materias:
+        se crean los nodos y se guardan sus relaciones pendientes, que se enlazan
+        al final (un prerrequisito puede aparecer después de la materia que lo usa).
         """
-        # Paso 1: crear todos los nodos
+        agregar = self.agregar_materia
+        pendientes: List[Tuple[str, List[str], List[str]]] = []
         for clave, datos in materias.items():
-            self.agregar_materia(
+            agregar(
                 nombre=datos["nombre"],
                 clave=clave,
                 creditos=int(datos["creditos"]),
                 estado=int(datos.get("estado", 0)),
                 semestre=datos.get("semestre")
             )
+            pendientes.append((clave, datos.get("prerreqs") or [], datos.get("coreqs") or []))
 
-        # Paso 2: enlazar prerreqs y coreqs
-        for clave, datos in materias.items():
-            for pr in datos.get("prerreqs", []):
-                self._link_prerreq(clave, pr)
-            for co in datos.get("coreqs", []):
-                self._link_coreq(clave, co)
+        # Enlazar prerreqs y coreqs
+        link_p, link_c = self._link_prerreq, self._link_coreq
+        for clave, prerreqs, coreqs in pendientes:
+            for pr in prerreqs:
+                link_p(clave, pr)
+            for co in coreqs:
+                link_c(clave, co)
+
+        self._indices()
 
     def from_json_file(self, path: str | Path) -> None:
-        with open(path, "r", encoding="utf-8") as f:
-            materias = json.load(f)
+        with open(path, "rb") as f:
+            materias = json_loads(f.read())
         self.from_json_dict(materias)
 
     def to_json_dict(self) -> Dict[str, dict]:
         """
         Exporta el grafo al mismo formato que se espera en el JSON de entrada,
-        incluyendo 'estado'.
+        incluyendo 'estado'. Las relaciones se exportan ordenadas por clave.
         """
         out: Dict[str, dict] = {}
         for clave, n in self.materias.items():
             out[clave] = {
                 "nombre": n.nombre,
                 "creditos": n.creditos,
-                "prerreqs": [p.clave for p in n.prerr],
-                "coreqs": [c.clave for c in n.ligadas],
+                "prerreqs": sorted(p.clave for p in n.prerr),
+                "coreqs": sorted(c.clave for c in n.ligadas),
                 "estado": n.estado,
                 "semestre": n.semestre
             }
@@ -133,8 +179,8 @@ class Grafo:
 
     def to_json_file(self, path: str | Path) -> None:
         data = self.to_json_dict()
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        with open(path, "wb") as f:
+            f.write(json_dumps(data))
 
     # --------- Lógica de estado y disponibilidad ---------
     def completar_materia(self, clave: str) -> None:
@@ -157,16 +203,16 @@ class Grafo:
         - Si tiene correquisitos, todos los correquisitos también deben cumplir sus propios
           prerrequisitos (y no estar completados), para poder tomarse juntos.
         """
-        disp: List[Nodo] = []
-        for m in self.materias.values():
-            if m.estado != 2 and all(p.estado == 2 for p in m.prerr):
-                coreqs_listos = all(
-                    (c.estado != 2) and all(p.estado == 2 for p in c.prerr)
-                    for c in m.ligadas
-                )
-                if coreqs_listos:
-                    disp.append(m)
-        return disp
+        self._indices()
+        hechas = self._mascara_completadas()
+        return [
+            m for m in self.materias.values()
+            if m.estado != 2 and (m.mascara_prerr & hechas) == m.mascara_prerr
+            and all(
+                c.estado != 2 and (c.mascara_prerr & hechas) == c.mascara_prerr
+                for c in m.ligadas
+            )
+        ]
 
     # Utilidades
     def get(self, clave: str):
@@ -174,36 +220,34 @@ class Grafo:
 
     def __len__(self):
         return len(self.materias)
-    
-    def grupos_coreq_disponibles(self):
-        vistos = set()
-        grupos = []
 
-        # Encuentra componentes conexas por correquisitos (ligadas)
-        for n in self.materias.values():
-            if n in vistos:
-                continue
-            # BFS/DFS para agrupar correquisitos
-            comp = set()
-            stack = [n]
-            while stack:
-                cur = stack.pop()
-                if cur in comp:
-                    continue
-                comp.add(cur)
-                for c in cur.ligadas:
-                    if c not in comp:
-                        stack.append(c)
-            vistos |= comp
+    # --------- Índices de disponibilidad ---------
+    def _indices(self) -> List[Tuple[Nodo, ...]]:
+        """Componentes de correquisitos; construye los índices si hace falta."""
+        if self._comps_coreq is None:
+            self._comps_coreq = self._construir_indices()
+        return self._comps_coreq
+
+    def _mascara_completadas(self) -> int:
+        # Se calcula con el estado actual de cada materia (una pasada), así no
+        # importa por dónde se haya cambiado el estado. Requiere índices construidos.
+        return reduce(or_, (m.bit for m in self.materias.values() if m.estado == 2), 0)
+
+    def _invalidar_indices(self) -> None:
+        self._comps_coreq = None
+        self.version += 1
+
+    def _construir_indices(self) -> List[Tuple[Nodo, ...]]:
+        materias = self.materias.values()
+        for i, m in enumerate(materias):
+            m.bit = 1 << i
+        for m in materias:
+            m.mascara_prerr = reduce(or_, (p.bit for p in m.prerr), 0)
+        return [
+            tuple(sorted(comp, key=lambda x: (x.sem_key, x.clave)))
+            for comp in self._componentes_coreq()
+        ]
 
-        # Verifica disponibilidad del grupo:
-        # - nadie completado
-        # - todos con prerreqs completos
-        if all(x.estado != 2 for x in comp) and all(all(p.estado == 2 for p in x.prerr) for x in comp):
-            grupos.append(comp)
-
-        return grupos
-    
     def _componentes_coreq(self):
         vistos = set()
         comps = []
@@ -211,7 +255,7 @@ class Grafo:
         for n in self.materias.values():
             if n in vistos:
                 continue
-        # DFS/BFS sobre 'ligadas'
+            # DFS/BFS sobre 'ligadas'
             comp = set()
             stack = [n]
             while stack:
@@ -227,37 +271,20 @@ class Grafo:
 
         return comps
 
-
-    def grupos_coreq_disponibles(self):
-   
-        grupos = []
-        for comp in self._componentes_coreq():
-        # comp puede ser de tamaño 1 (sin coreqs) o >1 (paquete de correquisitos)
-            if all(x.estado != 2 for x in comp) and all(all(p.estado == 2 for p in x.prerr) for x in comp):
-                grupos.append(sorted(list(comp), key=lambda x: x.clave))
-        return grupos
-
-    
-    
-
-
-# -------------------------
-#   Carga múltiple (opcional)
-# -------------------------
-
-def cargar_planes_desde_directorio(dir_path: str | Path) -> Dict[str, Grafo]:
-    """
-    Busca todos los archivos .json en un directorio y crea un Grafo por archivo.
-    Retorna un dict: nombre_archivo_sin_extension -> Grafo
-    """
-    dir_path = Path(dir_path)
-    planes: Dict[str, Grafo] = {}
-    for json_path in dir_path.glob("*.json"):
-        nombre = json_path.stem
-        g = Grafo(nombre_plan=nombre)
-        g.from_json_file(json_path)
-        planes[nombre] = g
-    return planes
+    def grupos_coreq_disponibles(self) -> List[Tuple[Nodo, ...]]:
+        """
+        Regresa los paquetes de correquisitos disponibles, cada uno ordenado por
+        semestre y luego por clave.
+        Un paquete puede ser de tamaño 1 (sin coreqs) o >1, y está disponible si
+        ninguno de sus miembros está completado y todos tienen sus prerrequisitos
+        completos.
+        """
+        comps = self._indices()
+        hechas = self._mascara_completadas()
+        return [
+            comp for comp in comps
+            if all(x.estado != 2 and (x.mascara_prerr & hechas) == x.mascara_prerr for x in comp)
+        ]
 
 
 # -------------------------
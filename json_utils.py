@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""
+json_utils.py
+Lectura y escritura de JSON compartida por la app y el extractor de PDFs.
+Usa orjson si está instalado y json de la stdlib en caso contrario. Al
+escribir, ambas rutas producen exactamente los mismos bytes; al leer bytes,
+ambas aceptan un BOM UTF-8 inicial como json.loads (orjson lo rechaza, así
+que se quita antes).
+"""
+from __future__ import annotations
+import json
+from types import ModuleType
+from typing import Any, Optional
+
+orjson: Optional[ModuleType]
+try:
+    import orjson
+except ImportError:  # orjson es opcional; sin él se usa json de la stdlib
+    orjson = None  # type: ignore[assignment]
+
+
+def json_loads(data: bytes | str) -> Any:
+    """Parsea JSON con orjson si está disponible."""
+    if orjson is not None:
+        # Archivos guardados desde Excel/Notepad en Windows suelen traer BOM
+        if isinstance(data, bytes):
+            data = data.removeprefix(b"\xef\xbb\xbf")
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_dumps(data: Any) -> bytes:
+    """Serializa a JSON UTF-8 con indentación de 2 espacios."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")